@@ -27,11 +27,11 @@
 #include <fstream>
 #include <vector>
 #include <cstdint>
+#include <cstring>
 #include <string>
 #include <iomanip>
 #include <stdexcept>
 #include <algorithm>
-#include <cmath>
 #include <filesystem>
 
 using namespace std;
@@ -44,32 +44,63 @@ bool DEBUG, XMLonly;
 #define ACTION_ICON "> "
 #define OK_ICON " (OK)"
 
-string convert_timestamp_to_date(uint32_t timestamp, bool break_line = false) {
-    time_t raw_time = timestamp; // Adjust for Mac timestamp
-    struct tm *time_info;
-    char buffer[80];
-    time_info = gmtime(&raw_time);
+#define MP4_EPOCH_OFFSET 2082844800 // seconds between 1904-01-01 (MP4 epoch) and 1970-01-01
+
+/**
+ * @brief Convert a number of days since 1970-01-01 to a proleptic Gregorian date.
+ * Integer-only version of Howard Hinnant's civil_from_days algorithm.
+ */
+void civil_from_days(int64_t days, int &year, unsigned &month, unsigned &day) {
+    days += 719468;
+    const int64_t era = (days >= 0 ? days : days - 146096) / 146097;
+    const auto doe = static_cast<unsigned>(days - era * 146097);             // [0, 146096]
+    const unsigned yoe = (doe - doe / 1460 + doe / 36524 - doe / 146096) / 365; // [0, 399]
+    const unsigned doy = doe - (365 * yoe + yoe / 4 - yoe / 100);           // [0, 365]
+    const unsigned mp = (5 * doy + 2) / 153;                                // [0, 11]
+    day = doy - (153 * mp + 2) / 5 + 1;
+    month = mp < 10 ? mp + 3 : mp - 9;
+    year = static_cast<int>(yoe + era * 400) + (month <= 2);
+}
 
-    strftime(buffer, sizeof(buffer), break_line ? "%d-%m-%Y\n%H:%M:%S" : "%d-%m-%Y %H:%M:%S", time_info);
+/**
+ * @brief Format a Unix timestamp as a UTC date, using integer arithmetic only.
+ * @param timestamp The Unix timestamp.
+ * @param break_line Put the time on its own line instead of after a space.
+ * @return A formatted string "dd-mm-yyyy hh:mm:ss".
+ */
+string convert_timestamp_to_date(uint32_t timestamp, bool break_line = false) {
+    int year;
+    unsigned month, day;
+    civil_from_days(timestamp / 86400, year, month, day);
+    uint32_t seconds_of_day = timestamp % 86400;
+
+    char buffer[40];
+    snprintf(buffer, sizeof(buffer), "%02u-%02u-%04d%c%02u:%02u:%02u", day, month, year, break_line ? '\n' : ' ',
+             seconds_of_day / 3600, (seconds_of_day % 3600) / 60, seconds_of_day % 60);
     return string(buffer);
 }
 
-uint64_t read_uint64_from_bytes(const vector<char> &data, size_t offset) {
-    if (offset + 4 > data.size()) {
-        throw std::out_of_range("Not enough data to unpack a 32-bit integer.");
-    }
+/**
+ * @brief Decode a big-endian 32-bit integer from raw bytes.
+ */
+inline uint32_t read_uint32_be(const char *bytes) {
+    const auto *b = reinterpret_cast<const unsigned char *>(bytes);
+    return (uint32_t(b[0]) << 24) | (uint32_t(b[1]) << 16) | (uint32_t(b[2]) << 8) | uint32_t(b[3]);
+}
 
-    return uint64_t(static_cast<unsigned char>(data[offset]) << 24) |
-           (static_cast<unsigned char>(data[offset + 1]) << 16) |
-           (static_cast<unsigned char>(data[offset + 2]) << 8) |
-           static_cast<unsigned char>(data[offset + 3]);
+/**
+ * @brief Decode a big-endian 64-bit integer from raw bytes.
+ */
+inline uint64_t read_uint64_be(const char *bytes) {
+    return (uint64_t(read_uint32_be(bytes)) << 32) | read_uint32_be(bytes + 4);
 }
 
-string extract_string(const vector<char> &data, size_t start, size_t length) {
-    if (start + length > data.size()) {
-        throw out_of_range("Not enough data to extract string.");
+uint32_t read_uint32_from_bytes(const vector<char> &data, size_t offset) {
+    if (offset + 4 > data.size()) {
+        throw std::out_of_range("Not enough data to unpack a 32-bit integer.");
     }
-    return string(data.begin() + start, data.begin() + start + length);
+
+    return read_uint32_be(data.data() + offset);
 }
 
 void parse_meta(vector<char> &data) {
@@ -82,28 +113,37 @@ void parse_meta(vector<char> &data) {
 
     uint64_t meta_pos = 4;
 
-    while (meta_pos < data.size()) {
-        // Extract box size (4 bytes)
-        uint32_t box_size = read_uint64_from_bytes(data, meta_pos);
-        if (box_size == 0) { //box size cannot be 0
+    while (meta_pos + 8 <= data.size()) {
+        // Each child starts with a 4 byte size and a 4 byte type, read in place
+        const char *header = data.data() + meta_pos;
+        uint32_t box_size = read_uint32_be(header);
+        if (box_size < 8 || meta_pos + box_size > data.size()) { //box must hold its header and fit in meta
             break;
         }
 
-        // Extract box type (4 bytes)
-        string box_type = extract_string(data, meta_pos + 4, 4);
+        const char *box_type = header + 4;
 
         if (DEBUG)
-            cout << "Box Type: " << box_type << ", Size: " << box_size << endl;
+            cout << "Box Type: " << string(box_type, 4) << ", Size: " << box_size << endl;
 
-        if (box_type == "xml ") {
+        if (memcmp(box_type, "xml ", 4) == 0) {
             if (!XMLonly) {
                 cout << WARNING_ICON << "This file contains additional data in XML." << endl;
             } else {
-                vector<char> xml_data(data.begin() + meta_pos + 12, data.begin() + meta_pos + box_size - 1);
-                string xmlSTR = string(xml_data.begin(), xml_data.end());
-                xmlSTR.erase(std::remove(xmlSTR.begin(), xmlSTR.end(), '\x00'), xmlSTR.end());
-
-                cout << string(xml_data.begin(), xml_data.end()) << endl;
+                // xml payload follows the 8 byte header and 4 bytes of version/flags, print it in place
+                if (box_size > 12) {
+                    const char *xml_data = header + 12;
+                    size_t xml_size = box_size - 12;
+
+                    // Drop the NUL terminator/padding at the end of the document instead of
+                    // assuming a single trailing byte
+                    while (xml_size > 0 && xml_data[xml_size - 1] == '\0') {
+                        --xml_size;
+                    }
+
+                    cout.write(xml_data, static_cast<streamsize>(xml_size));
+                    cout << endl;
+                }
             }
         }
 
@@ -113,154 +153,243 @@ void parse_meta(vector<char> &data) {
 }
 
 /**
- * @brief Format seconds as an SRT-compatible timestamp.
- * @param total_seconds The total number of seconds.
- * @return A formatted string "HH:MM:SS,000" (SRT requires milliseconds, so we add ,000)
+ * @brief Broken-down UTC date of every second of the video, kept as parallel arrays
+ * so the whole timecode track is generated in one pass without a string per second.
+ */
+struct Timecodes {
+    vector<uint16_t> year;
+    vector<uint8_t> month, day, hour, minute, second;
+
+    size_t size() const { return year.size(); }
+};
+
+/**
+ * @brief Expand a start timestamp into one broken-down date per second.
+ * @param start_timestamp The Unix timestamp of the first second.
+ * @param count The number of seconds to generate.
+ * @return The generated timecodes.
+ */
+Timecodes expand_timecodes(uint32_t start_timestamp, int count) {
+    Timecodes timecodes;
+    size_t n = count > 0 ? static_cast<size_t>(count) : 0;
+    timecodes.year.resize(n);
+    timecodes.month.resize(n);
+    timecodes.day.resize(n);
+    timecodes.hour.resize(n);
+    timecodes.minute.resize(n);
+    timecodes.second.resize(n);
+
+    // Only the first second of each day needs a calendar conversion, the time of
+    // day in between is carried forward with plain counters
+    int64_t days = start_timestamp / 86400;
+    uint32_t seconds_of_day = start_timestamp % 86400;
+    int hour = seconds_of_day / 3600, minute = (seconds_of_day % 3600) / 60, second = seconds_of_day % 60;
+    int year;
+    unsigned month, day;
+    civil_from_days(days, year, month, day);
+
+    for (size_t i = 0; i < n; ++i) {
+        if (i > 0 && ++second == 60) {
+            second = 0;
+            if (++minute == 60) {
+                minute = 0;
+                if (++hour == 24) {
+                    hour = 0;
+                    civil_from_days(++days, year, month, day);
+                }
+            }
+        }
+        timecodes.year[i] = year;
+        timecodes.month[i] = month;
+        timecodes.day[i] = day;
+        timecodes.hour[i] = hour;
+        timecodes.minute[i] = minute;
+        timecodes.second[i] = second;
+    }
+    return timecodes;
+}
+
+/**
+ * @brief Format a video offset as an SRT-compatible timestamp.
+ * @param hours The hours component.
+ * @param minutes The minutes component.
+ * @param seconds The seconds component.
+ * @return A formatted string "HH:MM:SS,000" (timecodes are whole seconds, SRT requires milliseconds, so we add ,000)
  */
-string format_seconds(int total_seconds) {
-    int hours = total_seconds / 3600;
-    int minutes = (total_seconds % 3600) / 60;
-    int seconds = total_seconds % 60;
-    char buffer[12];
+string format_srt_time(int hours, int minutes, int seconds) {
+    char buffer[40];
     snprintf(buffer, sizeof(buffer), "%02d:%02d:%02d,000", hours, minutes, seconds);
     return string(buffer);
 }
 
 /**
- * @brief Write the list of dates as subtitles to an SRT file.
+ * @brief Write the timecodes as subtitles to an SRT file.
+ * @param timecodes The timecodes, one per second of video.
  * @param file_path The original video file path.
- * @param dates_list A vector of date strings, each in the format "dd/mm/yyyy hh:mm:ss".
  */
-void write_dates_to_srt( const vector<string>& dates_list, const string &file_path) {
-    // Replace .mp4 or .MP4 with .srt
-    string srt_file_path = file_path;
-    size_t pos = srt_file_path.rfind(".mp4");
-    if (pos == string::npos) {
-        pos = srt_file_path.rfind(".MP4");
-    }
-    if (pos != string::npos) {
-        srt_file_path.replace(pos, 4, ".srt");
-    }
+void write_dates_to_srt(const Timecodes &timecodes, const string &file_path) {
+    // Replace the .mp4 or .MP4 suffix with .srt, read_file only accepts paths ending in one of them
+    string srt_file_path = file_path.substr(0, file_path.size() - 4) + ".srt";
 
     cout << ACTION_ICON << "Writing timecodes to SRT file: " << srt_file_path;
 
-    ofstream srt_file(srt_file_path);
+    // Binary mode: the text is already final, skip newline translation on Windows
+    ofstream srt_file(srt_file_path, ios::binary);
     if (!srt_file.is_open()) {
         cerr << "Failed to open SRT file for writing: " << srt_file_path << endl;
         return;
     }
 
-    int previous_time = 0;
-    for (size_t i = 0; i < dates_list.size(); ++i) {
-        const string& date = dates_list[i];
+    // Build the whole subtitle track in memory and hand it to the stream in a single write
+    string srt_text;
+    srt_text.reserve(timecodes.size() * 64);
+
+    // Every subtitle lasts exactly one second, so each end time is the next start time
+    // and the offset is carried with counters instead of being divided out per subtitle
+    int hours = 0, minutes = 0, seconds = 0;
+    string start_time = format_srt_time(hours, minutes, seconds);
+    char date[32];
+    for (size_t i = 0; i < timecodes.size(); ++i) {
+        if (++seconds == 60) {
+            seconds = 0;
+            if (++minutes == 60) {
+                minutes = 0;
+                ++hours;
+            }
+        }
+        string end_time = format_srt_time(hours, minutes, seconds);
+
+        snprintf(date, sizeof(date), "%02d-%02d-%04d\n%02d:%02d:%02d",
+                 timecodes.day[i], timecodes.month[i], timecodes.year[i],
+                 timecodes.hour[i], timecodes.minute[i], timecodes.second[i]);
 
-        // Write the subtitle index
-        srt_file << (i + 1) << "\n";
+        // Subtitle index
+        srt_text += to_string(i + 1);
+        srt_text += '\n';
 
-        // Write the time range
-        srt_file << format_seconds(previous_time) << " --> "
-                 << format_seconds(previous_time + 1) << "\n";
+        // Time range
+        srt_text += start_time;
+        srt_text += " --> ";
+        srt_text += end_time;
+        srt_text += '\n';
 
-        // Write the date and time
-        srt_file << date << "\n\n";
+        // Date and time
+        srt_text += date;
+        srt_text += "\n\n";
 
-        // Update the previous time
-        previous_time += 1;  // Increment by 1 second
+        start_time = end_time;
     }
 
+    srt_file.write(srt_text.data(), static_cast<streamsize>(srt_text.size()));
     srt_file.close();
+    if (srt_file.fail()) {
+        cerr << endl << "Failed to write SRT file: " << srt_file_path << endl;
+        return;
+    }
     cout << OK_ICON << endl;
 }
 
-uint64_t read_box(ifstream &file, uint64_t current_pos, const string &file_path) {
+/**
+ * @brief Location of an MP4 atom/box inside the file.
+ */
+struct BoxInfo {
+    string type;
+    uint64_t offset = 0;      // position of the box header
+    uint64_t size = 0;        // total box size, header included
+    uint64_t header_size = 8; // 8 bytes, or 16 when a 64-bit size follows the type
+};
+
+/**
+ * @brief Read the header of the box starting at the given position.
+ * @param file The MP4 file.
+ * @param current_pos The position of the box header.
+ * @param box Filled with the box location on success.
+ * @return false at end of file or when the box size is invalid.
+ */
+bool read_box_header(ifstream &file, uint64_t current_pos, BoxInfo &box) {
+    file.clear();
     file.seekg(current_pos);
-    char header[8];
+    char header[16];
     file.read(header, 8); // Read the 8-byte header (4 bytes size + 4 bytes type)
 
     if (file.gcount() < 8) {
-        throw runtime_error("End of file reached while reading box header.");
+        return false;
     }
 
-    // first 4 bytes are the size of the box
-    uint64_t boxSize = read_uint64_from_bytes(vector<char>(header, header + 4), 0);
-    if (boxSize == 0) {
+    // first 4 bytes are the size of the box, next 4 bytes are its type
+    box.offset = current_pos;
+    box.size = read_uint32_be(header);
+    box.type.assign(header + 4, 4);
+    box.header_size = 8;
+
+    if (box.size == 0) {
         cout << "MP4 Atom box cannot be size 0." << endl;
-        return -1;
+        return false;
     }
 
     // Handle large box sizes (when size == 1)
-    if (boxSize == 1) {
-        char extended_size_bytes[8];
-        file.read(extended_size_bytes, 8); // Read the 64-bit extended size
+    if (box.size == 1) {
+        file.read(header + 8, 8); // Read the 64-bit extended size
 
         if (file.gcount() < 8) {
-            throw runtime_error("End of file reached while reading extended size.");
+            return false;
         }
 
-        // Convert the 8-byte extended size from big-endian to uint64_t
-        boxSize = (static_cast<uint64_t>(static_cast<unsigned char>(extended_size_bytes[0])) << 56) |
-                  (static_cast<uint64_t>(static_cast<unsigned char>(extended_size_bytes[1])) << 48) |
-                  (static_cast<uint64_t>(static_cast<unsigned char>(extended_size_bytes[2])) << 40) |
-                  (static_cast<uint64_t>(static_cast<unsigned char>(extended_size_bytes[3])) << 32) |
-                  (static_cast<uint64_t>(static_cast<unsigned char>(extended_size_bytes[4])) << 24) |
-                  (static_cast<uint64_t>(static_cast<unsigned char>(extended_size_bytes[5])) << 16) |
-                  (static_cast<uint64_t>(static_cast<unsigned char>(extended_size_bytes[6])) << 8) |
-                  (static_cast<uint64_t>(static_cast<unsigned char>(extended_size_bytes[7])));
-
-        current_pos += 8;
+        box.size = read_uint64_be(header + 8);
+        box.header_size = 16;
     }
 
-    // next 4 bytes are the type of the box
-    string type(header + 4, header + 8);
+    if (box.size < box.header_size) {
+        return false;
+    }
 
     if (DEBUG) {
-        cout << "BOX: " << type << " size: " << boxSize << " @ pos: " << current_pos << "\n";
+        cout << "BOX: " << box.type << " size: " << box.size << " @ pos: " << box.offset << "\n";
     }
 
-    if (XMLonly) {
-        if (type == "meta") {
-            // Read the box data
-            vector<char> data(boxSize);
-            file.read(reinterpret_cast<char *> (data.data()), boxSize);
-            parse_meta(data);
-        }
-    } else {
-        if (type == "ftyp" || type == "moov" || type == "mvhd" || type == "meta") {
-            // Read the box data
-            vector<char> data(boxSize);
-            file.read(reinterpret_cast<char *> (data.data()), boxSize);
-
-            if (type == "ftyp") {
-                string major_brand(data.begin(), data.begin() + 4);
-                cout << INFO_ICON << "MP4 Major Brand: " << major_brand << "\n";
-            } else if (type == "moov") {
-                // Parse the moov box
-                read_box(file, current_pos + 8, file_path);
-            } else if (type == "mvhd") {
-                // Extracting data fields
-                uint64_t creation_time_raw = read_uint64_from_bytes(data, 4) - 2082844800;
-                cout << INFO_ICON << "First timestamp: " << convert_timestamp_to_date(creation_time_raw) << endl;
-
-                uint64_t time_scale = read_uint64_from_bytes(data, 12);
-                uint64_t duration = read_uint64_from_bytes(data, 16);
-                int duration_seconds = round(static_cast<double>(duration) / static_cast<double>(time_scale));
-
-                cout << INFO_ICON << "File duration: " << duration_seconds << " seconds" << endl;
-
-                vector<string> timecode;
-                for (int i = 0; i < duration_seconds; ++i) {
-                    timecode.push_back(convert_timestamp_to_date(creation_time_raw + i, true));
-                }
+    return true;
+}
 
-                write_dates_to_srt(timecode, file_path);
-            } else if (type == "meta") {
-                parse_meta(data);
-            }
-        }
+/**
+ * @brief Read the payload of a box of interest and print or export its contents.
+ * @param file The MP4 file.
+ * @param box The box to decode.
+ * @param file_path The MP4 file path, used to name the SRT file.
+ */
+void parse_box(ifstream &file, const BoxInfo &box, const string &file_path) {
+    if (XMLonly && box.type != "meta") {
+        return;
     }
 
-
-    return boxSize;
+    // Read the box data, mvhd only needs its leading fixed-size fields
+    uint64_t payload_size = box.size - box.header_size;
+    if (box.type == "mvhd") {
+        payload_size = min<uint64_t>(payload_size, 20);
+    }
+    vector<char> data(payload_size);
+    file.clear();
+    file.seekg(box.offset + box.header_size);
+    file.read(data.data(), static_cast<streamsize>(data.size()));
+
+    if (box.type == "ftyp") {
+        string major_brand(data.begin(), data.begin() + min<size_t>(4, data.size()));
+        cout << INFO_ICON << "MP4 Major Brand: " << major_brand << "\n";
+    } else if (box.type == "mvhd") {
+        // Extracting data fields
+        uint32_t creation_time_raw = read_uint32_from_bytes(data, 4) - MP4_EPOCH_OFFSET;
+        cout << INFO_ICON << "First timestamp: " << convert_timestamp_to_date(creation_time_raw) << endl;
+
+        uint64_t time_scale = read_uint32_from_bytes(data, 12);
+        uint64_t duration = read_uint32_from_bytes(data, 16);
+        // Round to the nearest second in integer arithmetic
+        int duration_seconds = time_scale == 0 ? 0 : static_cast<int>((duration + time_scale / 2) / time_scale);
+
+        cout << INFO_ICON << "File duration: " << duration_seconds << " seconds" << endl;
+
+        write_dates_to_srt(expand_timecodes(creation_time_raw, duration_seconds), file_path);
+    } else if (box.type == "meta") {
+        parse_meta(data);
+    }
 }
 
 void read_file(const string &file_path) {
@@ -286,14 +415,25 @@ void read_file(const string &file_path) {
     if (!XMLonly)
         cout << OK_ICON << endl;
 
+    // Walk the box headers in a single flat pass, stepping into "moov" instead of
+    // skipping it, and remember where the boxes of interest are
+    vector<BoxInfo> boxes;
+    BoxInfo box;
     uint64_t current_pos = 0;
-    while (true) {
+    while (read_box_header(file, current_pos, box)) {
+        if (box.type == "moov") {
+            current_pos += box.header_size;
+            continue;
+        }
+        if (box.type == "ftyp" || box.type == "mvhd" || box.type == "meta") {
+            boxes.push_back(box);
+        }
+        current_pos += box.size;
+    }
+
+    for (const BoxInfo &found : boxes) {
         try {
-            uint64_t box_size = read_box(file, current_pos, file_path);
-            if (box_size == -1) {
-                break;
-            }
-            current_pos += box_size;
+            parse_box(file, found, file_path);
         } catch (const exception &ignored) {
             break;
         }